@@ -2,90 +2,188 @@
 
 import argparse
 import subprocess
-import time
 import os
 import json
-from typing import List, Dict
-import matplotlib.pyplot as plt
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from typing import Any, List, Dict, Optional
 
-def generate_test_file(config_path: str, output_path: str, size_mb: float) -> None:
-    """Generate a test file of the specified size."""
-    subprocess.run(['python3', 'generate_test_file.py', config_path, output_path, str(size_mb)],
-                  check=True)
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
 
-def run_validation(file_path: str, config_path: str) -> float:
-    """Run the Lua validator and return the execution time in seconds."""
-    start_time = time.time()
-    result = subprocess.run(['lua', 'validate_file.lua', file_path, config_path],
-                          capture_output=True, text=True)
-    end_time = time.time()
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generate_test_file import TestDataGenerator
+
+# The Lua driver and the validator module it requires live in the repository root
+VALIDATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def find_interpreter() -> str:
+    """Pick the Lua interpreter: $LUA_BIN if set, else LuaJIT if installed, else lua."""
+    return os.environ.get('LUA_BIN') or shutil.which('luajit') or 'lua'
+
+class ValidatorDriver:
+    """A persistent Lua process that validates each file path written to its stdin."""
     
-    if result.returncode != 0:
-        raise RuntimeError(f"Validation failed: {result.stderr}")
+    def __init__(self, config_path: str, interpreter: str = 'lua'):
+        self.config_path = os.path.abspath(config_path)
+        self.interpreter = interpreter
+        self._start()
     
-    return end_time - start_time
+    def _start(self) -> None:
+        """Start the driver process in the validator's directory, so it can require the validator."""
+        self._proc = subprocess.Popen([self.interpreter, 'validate_driver.lua', self.config_path],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE, text=True, bufsize=1,
+                                      cwd=VALIDATOR_DIR)
+    
+    def validate(self, file_path: str) -> float:
+        """Validate a file and return the CPU time measured by the driver in seconds."""
+        try:
+            self._proc.stdin.write(os.path.abspath(file_path) + '\n')
+            self._proc.stdin.flush()
+            line = self._proc.stdout.readline()
+        except BrokenPipeError:
+            line = ''
+        
+        if not line:
+            # The driver has exited; report why and start a fresh one for the next run
+            self._proc.wait()
+            error = self._proc.stderr.read().strip()
+            status = self._proc.returncode
+            self.close()
+            self._start()
+            raise RuntimeError(f"Validator driver exited with status {status}: {error}")
+        
+        elapsed, status, message = line.rstrip('\n').split('\t', 2)
+        if status != 'ok':
+            raise RuntimeError(f"Validation failed: {message}")
+        return float(elapsed)
+    
+    def close(self) -> None:
+        """Stop the driver process."""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._proc.wait()
+        self._proc.stdout.close()
+        self._proc.stderr.close()
 
-def run_benchmark(config_path: str, sizes_mb: List[float], runs_per_size: int = 3) -> Dict:
-    """Run benchmarks for different file sizes."""
+def run_benchmark(config_path: str, sizes_mb: List[float], runs_per_size: int = 3,
+                  max_workers: int = 1, interpreter: Optional[str] = None) -> Dict:
+    """Run benchmarks for different file sizes.
+    
+    Sizes run one after another; max_workers only spreads each size's runs over
+    several drivers, since concurrent runs compete for CPU and memory bandwidth.
+    """
+    if interpreter is None:
+        interpreter = find_interpreter()
+    sizes_mb = sorted(set(sizes_mb))  # Ascending, so each size extends the previous file
+    
     results = {
+        'interpreter': interpreter,
+        'jobs': max_workers,
+        'timing': 'cpu',  # Driver-measured CPU seconds per run
         'sizes_mb': sizes_mb,
         'times': [],
         'throughputs': []  # MB/s
     }
     
-    print("\nRunning benchmarks...")
-    print(f"{'Size (MB)':>10} {'Time (s)':>10} {'Throughput (MB/s)':>15}")
+    print(f"\nRunning benchmarks with {interpreter}...")
+    print(f"{'Size (MB)':>10} {'CPU (s)':>10} {'Throughput (MB/s)':>15}")
     print("-" * 35)
     
-    for size_mb in sizes_mb:
-        # Generate test file
-        test_file = f'benchmark_test_{size_mb}MB.txt'
-        generate_test_file(config_path, test_file, size_mb)
-        
-        # Run multiple times and take average
-        times = []
-        for _ in range(runs_per_size):
-            try:
-                execution_time = run_validation(test_file, config_path)
-                times.append(execution_time)
-            except RuntimeError as e:
-                print(f"Error during validation: {e}")
-                continue
-        
-        if times:
-            avg_time = sum(times) / len(times)
-            throughput = size_mb / avg_time
-            results['times'].append(avg_time)
-            results['throughputs'].append(throughput)
-            
-            print(f"{size_mb:10.1f} {avg_time:10.3f} {throughput:15.2f}")
+    # Parse the config once and reuse the generator for every size
+    generator = TestDataGenerator(config_path)
+    test_file = 'benchmark_test.txt'
+    
+    # Start one persistent Lua driver per worker; each run borrows an idle one
+    drivers = Queue()
+    for _ in range(max_workers):
+        drivers.put(ValidatorDriver(config_path, interpreter))
+    
+    def validate(test_file: str) -> float:
+        driver = drivers.get()
+        try:
+            return driver.validate(test_file)
+        finally:
+            drivers.put(driver)
+    
+    # The Lua work happens in the driver processes, so threads are enough to run them concurrently
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for i, size_mb in enumerate(sizes_mb):
+                # Grow one test file from each size to the next, so every size only
+                # generates the records it adds to the previous one
+                if i == 0:
+                    generator.generate_file(test_file, size_mb)
+                else:
+                    generator.append_to_size(test_file, size_mb)
+                
+                # Run multiple times and take average
+                futures = [executor.submit(validate, test_file) for _ in range(runs_per_size)]
+                times = []
+                for future in futures:
+                    try:
+                        times.append(future.result())
+                    except RuntimeError as e:
+                        print(f"Error during validation: {e}")
+                        continue
+                
+                if times:
+                    avg_time = sum(times) / len(times)
+                    throughput = size_mb / avg_time
+                    results['times'].append(avg_time)
+                    results['throughputs'].append(throughput)
+                    
+                    print(f"{size_mb:10.1f} {avg_time:10.3f} {throughput:15.2f}")
+    finally:
+        while not drivers.empty():
+            drivers.get().close()
         
         # Clean up test file
-        os.remove(test_file)
+        if os.path.exists(test_file):
+            os.remove(test_file)
     
     return results
 
 def plot_results(results: Dict, output_prefix: str) -> None:
     """Generate plots for the benchmark results."""
+    # Imported here so the measurements don't pay for matplotlib's start-up
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot as plt
+    
+    # Draw both plots on one reused figure
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
     # Time vs Size plot
-    plt.figure(figsize=(10, 6))
-    plt.plot(results['sizes_mb'], results['times'], 'b-o')
-    plt.xlabel('File Size (MB)')
-    plt.ylabel('Validation Time (s)')
-    plt.title('Validation Time vs File Size')
-    plt.grid(True)
-    plt.savefig(f'{output_prefix}_time.png')
-    plt.close()
+    ax.plot(results['sizes_mb'], results['times'], 'b-o')
+    ax.set_xlabel('File Size (MB)')
+    ax.set_ylabel('Validation CPU Time (s)')
+    ax.set_title('Validation Time vs File Size')
+    ax.grid(True)
+    fig.savefig(f'{output_prefix}_time.png', dpi=100)
     
     # Throughput vs Size plot
-    plt.figure(figsize=(10, 6))
-    plt.plot(results['sizes_mb'], results['throughputs'], 'g-o')
-    plt.xlabel('File Size (MB)')
-    plt.ylabel('Throughput (MB/s)')
-    plt.title('Validation Throughput vs File Size')
-    plt.grid(True)
-    plt.savefig(f'{output_prefix}_throughput.png')
-    plt.close()
+    ax.clear()
+    ax.plot(results['sizes_mb'], results['throughputs'], 'g-o')
+    ax.set_xlabel('File Size (MB)')
+    ax.set_ylabel('Throughput (MB/s)')
+    ax.set_title('Validation Throughput vs File Size')
+    ax.grid(True)
+    fig.savefig(f'{output_prefix}_throughput.png', dpi=100)
+    plt.close(fig)
+
+def dump_json(obj: Any) -> bytes:
+    """Serialize obj as indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode('utf-8')
 
 def main():
     parser = argparse.ArgumentParser(description='Benchmark Lua validator performance')
@@ -94,17 +192,22 @@ def main():
                         help='File sizes to test in MB')
     parser.add_argument('--runs', type=int, default=3,
                         help='Number of runs per file size')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of validation runs of one size to execute concurrently')
+    parser.add_argument('--interpreter', default=None,
+                        help='Lua interpreter to run the validator with '
+                             '(default: $LUA_BIN, else luajit if installed, else lua)')
     parser.add_argument('--output', default='benchmark_results',
                         help='Prefix for output files')
     
     args = parser.parse_args()
     
     # Run benchmarks
-    results = run_benchmark(args.config, args.sizes, args.runs)
+    results = run_benchmark(args.config, args.sizes, args.runs, args.jobs, args.interpreter)
     
     # Save results
-    with open(f'{args.output}.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    with open(f'{args.output}.json', 'wb') as f:
+        f.write(dump_json(results))
     
     # Generate plots
     plot_results(results, args.output)
@@ -1,20 +1,80 @@
 #!/usr/bin/env python3
 
 import argparse
+import functools
+import itertools
 import random
 import string
 import re
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Fall back to the per-record generator
+    np = None
+
+def _sampler(alphabet: str) -> Tuple[bytes, bytes]:
+    """Build a translate table for alphabet and the bytes to delete so every character is equally likely."""
+    limit = 256 - 256 % len(alphabet)
+    return bytes(ord(alphabet[i % len(alphabet)]) for i in range(256)), bytes(range(limit, 256))
+
+# Field kinds inferred from the config patterns
+KIND_NAME, KIND_INT, KIND_EMAIL, KIND_PRICE, KIND_PCODE, KIND_TEXT = range(6)
+
+_NAME_PATTERN = re.compile(r'\^[A-Za-z\' \",]+\$')
+_INT_PATTERN = re.compile(r'\^[0-9]+\$')
+_PRODUCT_CODE_PATTERN = re.compile(r'\^[A-Z0-9]+\$')
+
+FIRST_NAMES = ['John', 'Jane', 'Robert', 'Mary', 'William', 'Elizabeth', 'James', 'Sarah']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis']
+DOMAINS = ['example.com', 'test.com', 'company.com', 'mail.com']
+TEXT_LENGTH = 20
+
+# FIRST_NAMES and LAST_NAMES hold 2**NAME_BITS entries each
+NAME_BITS = 3
+
+_LOWERCASE_SAMPLER = _sampler(string.ascii_lowercase)
+_TEXT_SAMPLER = _sampler(string.ascii_letters + ' ')
+
+# Every three-letter prefix and three-digit suffix of a product code, indexed by one random draw
+_PRODUCT_CODE_LETTERS = [''.join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=3)]
+_PRODUCT_CODE_DIGITS = [f'{number:03d}' for number in range(1000)]
+
+# Number of records generated per NumPy batch
+BATCH_RECORDS = 65536
+
+# Outputs at least this large are assembled with the Numba kernel, when installed;
+# below it, importing Numba and loading the kernel costs more than it saves
+COMPILED_MIN_BYTES = 16 << 20
+
+# Bytes buffered by the per-record generator between writes
+WRITE_BUFFER_SIZE = 4 << 20
 
 class TestDataGenerator:
     def __init__(self, config_file: str):
         """Initialize the generator with a Lua config file."""
         self.config = self._parse_lua_config(config_file)
+        self._rng = random.Random()
+        self.pattern_kinds = self._classify_patterns(tuple(self.config['patterns']))
         self.pattern_generators = self._create_pattern_generators()
+        if np is not None:
+            self._np_rng = np.random.default_rng()
+            self.batch_generators = self._create_batch_generators()
         
     def _parse_lua_config(self, config_file: str) -> Dict[str, Any]:
-        """Parse the Lua config file and extract relevant information."""
+        """Parse the Lua config file, reusing the result while the file is unchanged."""
+        path = os.path.abspath(config_file)
+        config = self._load_lua_config(path, os.stat(path).st_mtime_ns)
+        return dict(config, patterns=list(config['patterns']))
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _load_lua_config(config_file: str, mtime_ns: int) -> Dict[str, Any]:
+        """Parse the Lua config file and extract relevant information.
+        
+        mtime_ns is only part of the cache key, so edited files are parsed again.
+        """
         with open(config_file, 'r') as f:
             content = f.read()
             
@@ -51,79 +111,351 @@ class TestDataGenerator:
         config['patterns'] = patterns
         return config
     
-    def _create_pattern_generators(self) -> List[callable]:
-        """Create generator functions for each pattern."""
-        generators = []
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _classify_patterns(patterns: Tuple[str, ...]) -> Tuple[int, ...]:
+        """Determine the kind of field each pattern describes."""
+        kinds = []
         
-        for pattern in self.config['patterns']:
-            if re.search(r'\^[A-Za-z\' \",]+\$', pattern):  # Name pattern
-                generators.append(lambda: self._generate_name())
-            elif re.search(r'\^[0-9]+\$', pattern):  # Integer pattern
-                generators.append(lambda: str(random.randint(18, 80)))
+        for pattern in patterns:
+            if _NAME_PATTERN.search(pattern):  # Name pattern
+                kinds.append(KIND_NAME)
+            elif _INT_PATTERN.search(pattern):  # Integer pattern
+                kinds.append(KIND_INT)
             elif '@' in pattern:  # Email pattern
-                generators.append(lambda: self._generate_email())
+                kinds.append(KIND_EMAIL)
             elif r'\.[0-9]{1,2}' in pattern:  # Price pattern
-                generators.append(lambda: f"{random.uniform(10, 1000):.2f}")
-            elif re.search(r'\^[A-Z0-9]+\$', pattern):  # Product code pattern
-                generators.append(lambda: self._generate_product_code())
+                kinds.append(KIND_PRICE)
+            elif _PRODUCT_CODE_PATTERN.search(pattern):  # Product code pattern
+                kinds.append(KIND_PCODE)
             else:  # Generic text pattern
-                generators.append(lambda: self._generate_text(20))
+                kinds.append(KIND_TEXT)
         
-        return generators
+        return tuple(kinds)
+    
+    def _create_pattern_generators(self) -> Tuple[callable, ...]:
+        """Create generator functions for each pattern."""
+        # Indexed by field kind
+        generators = (
+            self._generate_name,
+            self._generate_int,
+            self._generate_email,
+            self._generate_price,
+            self._generate_product_code,
+            self._generate_text,
+        )
+        return tuple(generators[kind] for kind in self.pattern_kinds)
+    
+    def _create_batch_generators(self) -> List[callable]:
+        """Create NumPy batch generator functions for each pattern."""
+        names = [f'{first} {last}' for first in FIRST_NAMES for last in LAST_NAMES]
+        quoted_names = [f'"{last}, {first}"' for first in FIRST_NAMES for last in LAST_NAMES]
+        self._name_table = _byte_table(names + quoted_names)
+        self._int_table = _byte_table([str(value) for value in range(18, 81)])
+        self._domain_table = _byte_table(['@' + domain for domain in DOMAINS])
+        self._price_table = _byte_table([f'{value}.' for value in range(10, 1001)])
+        self._lowercase = _byte_array(string.ascii_lowercase)
+        self._uppercase = _byte_array(string.ascii_uppercase)
+        self._digits = _byte_array(string.digits)
+        self._text_chars = _byte_array(string.ascii_letters + ' ')
+        
+        generators = {
+            KIND_NAME: self._generate_name_batch,
+            KIND_INT: self._generate_int_batch,
+            KIND_EMAIL: self._generate_email_batch,
+            KIND_PRICE: self._generate_price_batch,
+            KIND_PCODE: self._generate_product_code_batch,
+            KIND_TEXT: lambda count: self._generate_text_batch(TEXT_LENGTH, count),
+        }
+        return [generators[kind] for kind in self.pattern_kinds]
     
     def _generate_name(self) -> str:
         """Generate a random name."""
-        first_names = ['John', 'Jane', 'Robert', 'Mary', 'William', 'Elizabeth', 'James', 'Sarah']
-        last_names = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis']
-        
-        if random.random() < 0.3:  # 30% chance of quoted name with comma
-            name = f'"{random.choice(last_names)}, {random.choice(first_names)}"'
+        rng = self._rng
+        first = FIRST_NAMES[rng.getrandbits(NAME_BITS)]
+        last = LAST_NAMES[rng.getrandbits(NAME_BITS)]
+        if rng.random() < 0.3:  # 30% chance of quoted name with comma
+            name = f'"{last}, {first}"'
         else:
-            name = f'{random.choice(first_names)} {random.choice(last_names)}'
+            name = f'{first} {last}'
         return name
     
+    def _generate_int(self) -> str:
+        """Generate a random integer between 18 and 80."""
+        return str(18 + self._rng.randrange(63))
+    
     def _generate_email(self) -> str:
         """Generate a random email address."""
-        domains = ['example.com', 'test.com', 'company.com', 'mail.com']
-        name = ''.join(random.choices(string.ascii_lowercase, k=random.randint(5, 10)))
-        return f"{name}@{random.choice(domains)}"
+        rng = self._rng
+        name = self._sample(_LOWERCASE_SAMPLER, 5 + rng.randrange(6))
+        return f"{name}@{DOMAINS[rng.randrange(len(DOMAINS))]}"
+    
+    def _generate_price(self) -> str:
+        """Generate a random price between 10 and 1000."""
+        return f"{10 + self._rng.random() * 990:.2f}"
     
     def _generate_product_code(self) -> str:
         """Generate a random product code."""
-        letters = ''.join(random.choices(string.ascii_uppercase, k=3))
-        numbers = ''.join(random.choices(string.digits, k=3))
-        return f"{letters}{numbers}"
+        # One draw covers all six characters: three letters followed by three digits
+        letters, digits = divmod(self._rng.randrange(len(_PRODUCT_CODE_LETTERS) * 1000), 1000)
+        return _PRODUCT_CODE_LETTERS[letters] + _PRODUCT_CODE_DIGITS[digits]
     
-    def _generate_text(self, max_length: int) -> str:
+    def _generate_text(self, max_length: int = TEXT_LENGTH) -> str:
         """Generate random text of given maximum length."""
-        length = random.randint(5, max_length)
-        return ''.join(random.choices(string.ascii_letters + ' ', k=length))
+        return self._sample(_TEXT_SAMPLER, 5 + self._rng.randrange(max_length - 4))
+    
+    def _sample(self, sampler: Tuple[bytes, bytes], length: int) -> str:
+        """Draw length random characters, discarding the bytes that would bias the sampler."""
+        table, rejected = sampler
+        # Draw a few spare bytes, so rejected ones rarely need a second draw
+        raw = self._rng.getrandbits(8 * length + 64).to_bytes(length + 8, 'little')
+        chars = raw.translate(table, rejected)
+        while len(chars) < length:
+            chars += self._rng.getrandbits(64).to_bytes(8, 'little').translate(table, rejected)
+        return chars[:length].decode('ascii')
+    
+    def _generate_name_batch(self, count: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Generate a batch of random names."""
+        rng = self._np_rng
+        pairs = len(FIRST_NAMES) * len(LAST_NAMES)
+        index = rng.integers(0, pairs, size=count)
+        index[rng.random(count) < 0.3] += pairs  # 30% chance of quoted name with comma
+        table, lengths = self._name_table
+        return table[index], lengths[index]
+    
+    def _generate_int_batch(self, count: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Generate a batch of random integers between 18 and 80."""
+        index = self._np_rng.integers(0, 63, size=count)
+        table, lengths = self._int_table
+        return table[index], lengths[index]
+    
+    def _generate_email_batch(self, count: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Generate a batch of random email addresses."""
+        rng = self._np_rng
+        name = self._lowercase[rng.integers(0, 26, size=(count, 10))]
+        name_lengths = rng.integers(5, 11, size=count)
+        table, lengths = self._domain_table
+        index = rng.integers(0, len(DOMAINS), size=count)
+        return _concat([(name, name_lengths), (table[index], lengths[index])])
+    
+    def _generate_price_batch(self, count: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Generate a batch of random prices between 10 and 1000."""
+        cents = np.rint(self._np_rng.uniform(10, 1000, size=count) * 100).astype(np.int64)
+        table, lengths = self._price_table
+        index = cents // 100 - 10
+        fraction = cents % 100
+        decimals = self._digits[np.stack([fraction // 10, fraction % 10], axis=1)]
+        return _concat([(table[index], lengths[index]), (decimals, np.full(count, 2))])
+    
+    def _generate_product_code_batch(self, count: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Generate a batch of random product codes."""
+        rng = self._np_rng
+        letters = self._uppercase[rng.integers(0, 26, size=(count, 3))]
+        numbers = self._digits[rng.integers(0, 10, size=(count, 3))]
+        return np.hstack([letters, numbers]), np.full(count, 6)
+    
+    def _generate_text_batch(self, max_length: int, count: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Generate a batch of random text of given maximum length."""
+        rng = self._np_rng
+        text = self._text_chars[rng.integers(0, len(self._text_chars), size=(count, max_length))]
+        return text, rng.integers(5, max_length + 1, size=count)
     
     def generate_record(self) -> str:
         """Generate a single record using the configured patterns."""
-        fields = [generator() for generator in self.pattern_generators]
-        return self.config['delimiter'].join(fields)
+        generators = self.pattern_generators
+        return self.config['delimiter'].join([generator() for generator in generators])
+    
+    def generate_batch(self, count: int, compiled: bool = False) -> Tuple[Any, 'np.ndarray']:
+        """Generate count newline-terminated records, returning their bytes and lengths.
+        
+        With compiled set, records are assembled by the Numba kernel if Numba is installed.
+        """
+        if not self.batch_generators:
+            # Without patterns every record is an empty line
+            return b'\n' * count, np.ones(count, dtype=np.int64)
+        
+        columns = [generator(count) for generator in self.batch_generators]
+        delimiter = _byte_array(self.config['delimiter'])
+        fill_buffer = _compiled_kernel() if compiled else None
+        if fill_buffer is not None:
+            return _assemble_compiled(columns, delimiter, fill_buffer)
+        return _assemble(columns, delimiter)
+    
+    def _header(self) -> str:
+        """Build the header line for the configured patterns."""
+        return self.config['delimiter'].join([f"Field{i+1}" for i in range(len(self.config['patterns']))])
     
     def generate_file(self, output_file: str, target_size_mb: float) -> None:
         """Generate a file of approximately the specified size in MB."""
+        self._write_file(output_file, target_size_mb, append=False)
+    
+    def append_to_size(self, output_file: str, target_size_mb: float) -> None:
+        """Append records to a previously generated file until it is approximately the specified size in MB."""
+        self._write_file(output_file, target_size_mb, append=True)
+    
+    def _write_file(self, output_file: str, target_size_mb: float, append: bool) -> None:
+        """Write records to output_file from its current end until it reaches the target size."""
         target_size_bytes = int(target_size_mb * 1024 * 1024)
-        current_size = 0
         
-        with open(output_file, 'w', encoding='utf-8') as f:
+        fd, current_size = _open_output(output_file, target_size_bytes, append)
+        try:
             # Write header if configured
-            if self.config['has_header']:
-                header = self.config['delimiter'].join([f"Field{i+1}" for i in range(len(self.config['patterns']))])
-                f.write(header + '\n')
-                current_size = len(header) + 1
+            if not append and self.config['has_header']:
+                header = (self._header() + '\n').encode('utf-8')
+                _write_all(fd, header)
+                current_size += len(header)
+            
+            if np is not None:
+                current_size = self._write_batches(fd, current_size, target_size_bytes)
+            else:
+                current_size = self._write_records(fd, current_size, target_size_bytes)
             
-            # Write records until we reach or exceed the target size
-            while current_size < target_size_bytes:
-                record = self.generate_record()
-                f.write(record + '\n')
-                current_size += len(record) + 1
+            os.ftruncate(fd, current_size)
+        finally:
+            os.close(fd)
         
         actual_size_mb = os.path.getsize(output_file) / (1024 * 1024)
         print(f"Generated file '{output_file}' of size {actual_size_mb:.2f} MB")
+    
+    def _write_records(self, fd: int, current_size: int, target_size_bytes: int) -> int:
+        """Write records one at a time, flushing in large chunks, and return the new size."""
+        buf = bytearray()
+        generate_record = self.generate_record
+        
+        # Write records until we reach or exceed the target size, counting the
+        # encoded bytes once as they are appended
+        while current_size < target_size_bytes:
+            record = generate_record().encode('utf-8')
+            buf += record
+            buf.append(0x0A)
+            current_size += len(record) + 1
+            if len(buf) >= WRITE_BUFFER_SIZE:
+                _write_all(fd, buf)
+                buf.clear()
+        
+        _write_all(fd, buf)
+        return current_size
+    
+    def _write_batches(self, fd: int, current_size: int, target_size_bytes: int) -> int:
+        """Write records in NumPy batches, stopping at the same record as the per-record loop."""
+        # Only outputs large enough to repay Numba's start-up use the compiled kernel
+        compiled = target_size_bytes - current_size >= COMPILED_MIN_BYTES
+        
+        # Start with a small batch and size later ones from the observed record length
+        count = min(BATCH_RECORDS, 1024)
+        while current_size < target_size_bytes:
+            remaining = target_size_bytes - current_size
+            data, lengths = self.generate_batch(count, compiled)
+            ends = np.cumsum(lengths)
+            if ends[-1] >= remaining:
+                size = int(ends[np.searchsorted(ends, remaining)])
+                _write_all(fd, memoryview(data)[:size])
+                return current_size + size
+            _write_all(fd, data)
+            current_size += int(ends[-1])
+            count = min(BATCH_RECORDS, (remaining - int(ends[-1])) * count // int(ends[-1]) + 1)
+        
+        return current_size
+    
+def _open_output(output_file: str, size_hint: int, append: bool = False) -> Tuple[int, int]:
+    """Open output_file for writing at its end, preallocating up to size_hint bytes where supported.
+    
+    Returns the file descriptor and the current size of the file.
+    """
+    flags = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    if not append:
+        flags |= os.O_CREAT | os.O_TRUNC
+    fd = os.open(output_file, flags, 0o644)
+    size = os.lseek(fd, 0, os.SEEK_END)
+    if hasattr(os, 'posix_fallocate') and size_hint > size:
+        try:
+            os.posix_fallocate(fd, size, size_hint - size)
+        except OSError:  # Filesystem without fallocate support
+            pass
+    return fd, size
+
+def _write_all(fd: int, data) -> None:
+    """Write all of data to fd, retrying after short writes."""
+    view = memoryview(data).cast('B')
+    while view:
+        view = view[os.write(fd, view):]
+
+def _byte_array(text: str) -> 'np.ndarray':
+    """Convert a string to a uint8 array of its UTF-8 bytes."""
+    return np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+
+def _byte_table(values: List[str]) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Build a zero-padded uint8 table and byte-length array from a list of strings."""
+    encoded = [_byte_array(value) for value in values]
+    width = max(len(value) for value in encoded)
+    table = np.zeros((len(encoded), width), dtype=np.uint8)
+    for i, value in enumerate(encoded):
+        table[i, :len(value)] = value
+    return table, np.array([len(value) for value in encoded], dtype=np.int64)
+
+def _concat(parts: List[Tuple['np.ndarray', 'np.ndarray']]) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Concatenate padded byte columns row by row, honouring each row's length."""
+    count = len(parts[0][1])
+    width = sum(column.shape[1] for column, _ in parts)
+    result = np.zeros((count, width), dtype=np.uint8)
+    rows = np.arange(count)[:, None]
+    position = np.zeros(count, dtype=np.int64)
+    
+    for column, lengths in parts:
+        offsets = np.arange(column.shape[1])
+        mask = offsets < lengths[:, None]
+        targets = position[:, None] + offsets
+        result[np.broadcast_to(rows, mask.shape)[mask], targets[mask]] = column[mask]
+        position += lengths
+    
+    return result, position
+
+def _flatten(records: 'np.ndarray', lengths: 'np.ndarray') -> bytes:
+    """Join padded records into one contiguous byte string."""
+    return records[np.arange(records.shape[1]) < lengths[:, None]].tobytes()
+
+def _assemble(columns: List[Tuple['np.ndarray', 'np.ndarray']],
+              delimiter: 'np.ndarray') -> Tuple[bytes, 'np.ndarray']:
+    """Join field columns into delimited, newline-terminated records."""
+    count = len(columns[0][1])
+    delimiter = (np.broadcast_to(delimiter, (count, len(delimiter))), np.full(count, len(delimiter)))
+    newline = (np.full((count, 1), ord('\n'), dtype=np.uint8), np.ones(count, dtype=np.int64))
+    
+    parts = []
+    for column in columns:
+        if parts:
+            parts.append(delimiter)
+        parts.append(column)
+    parts.append(newline)
+    
+    records, lengths = _concat(parts)
+    return _flatten(records, lengths), lengths
+
+def _assemble_compiled(columns: List[Tuple['np.ndarray', 'np.ndarray']],
+                       delimiter: 'np.ndarray', fill_buffer) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Join field columns into records by writing them straight into one output buffer."""
+    count = len(columns[0][1])
+    width = max(column.shape[1] for column, _ in columns)
+    fields = np.zeros((len(columns), count, width), dtype=np.uint8)
+    for i, (column, _) in enumerate(columns):
+        fields[i, :, :column.shape[1]] = column
+    field_lengths = np.stack([lengths for _, lengths in columns]).astype(np.int64)
+    
+    # Exact record lengths give each record's offset via an exclusive scan
+    lengths = field_lengths.sum(axis=0) + (len(columns) - 1) * len(delimiter) + 1
+    offsets = np.cumsum(lengths) - lengths
+    buffer = np.empty(int(lengths.sum()), dtype=np.uint8)
+    fill_buffer(buffer, offsets, fields, field_lengths, delimiter)
+    return buffer, lengths
+
+@functools.lru_cache(maxsize=None)
+def _compiled_kernel():
+    """Import the Numba record kernel on first use, or return None without Numba."""
+    try:
+        from record_kernel import fill_buffer
+    except ImportError:  # Assemble batches with plain NumPy
+        return None
+    return fill_buffer
 
 def main():
     parser = argparse.ArgumentParser(description='Generate test files for Lua validator')
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+"""Numba kernel for assembling generated records, imported only for large outputs."""
+
+from numba import njit, prange
+
+@njit(parallel=True, cache=True)
+def fill_buffer(buffer, offsets, fields, field_lengths, delimiter):
+    """Copy each record's fields, delimiters and newline to its offset in buffer."""
+    columns, count = field_lengths.shape
+    for i in prange(count):
+        position = offsets[i]
+        for column in range(columns):
+            if column > 0:
+                for j in range(delimiter.size):
+                    buffer[position + j] = delimiter[j]
+                position += delimiter.size
+            for j in range(field_lengths[column, i]):
+                buffer[position + j] = fields[column, i, j]
+            position += field_lengths[column, i]
+        buffer[position] = 10  # '\n'
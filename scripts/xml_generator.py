@@ -9,6 +9,17 @@ from typing import Dict, List, Tuple, Optional
 from lxml import etree
 import math
 
+# Maps every byte value onto the string alphabet, so random bytes translate to characters;
+# bytes past the last whole multiple of the alphabet are deleted to keep characters equally likely
+_STRING_CHARS = string.ascii_letters + string.digits + ' '
+_STRING_TABLE = bytes(ord(_STRING_CHARS[i % len(_STRING_CHARS)]) for i in range(256))
+_STRING_REJECTED = bytes(range(256 - 256 % len(_STRING_CHARS), 256))
+
+_ROOT_XPATH = etree.XPath(
+    "//xs:element[@name]",
+    namespaces={'xs': 'http://www.w3.org/2001/XMLSchema'}
+)
+
 class XMLGenerator:
     """Generates valid XML files based on XSD schemas with size control."""
     
@@ -20,14 +31,16 @@ class XMLGenerator:
     
     def __init__(self, schema_path: str):
         """Initialize generator with schema."""
+        self._rng = random.Random()
         self.schema_doc = etree.parse(schema_path)
         self.schema = etree.XMLSchema(self.schema_doc)
         self.nsmap = self.schema_doc.getroot().nsmap
         self.type_generators = self._create_type_generators()
+        self._type_cache = {}  # Raw type attribute -> generator
         
         # Extract root element information
         self.root_element = self._find_root_element()
-        if not self.root_element:
+        if self.root_element is None:
             raise ValueError("Could not determine root element from schema")
     
     def _create_type_generators(self) -> Dict:
@@ -45,10 +58,7 @@ class XMLGenerator:
     def _find_root_element(self) -> Optional[etree.Element]:
         """Find the root element definition in the schema."""
         # Look for elements at the schema level
-        root_elements = self.schema_doc.xpath(
-            "//xs:element[@name]",
-            namespaces={'xs': 'http://www.w3.org/2001/XMLSchema'}
-        )
+        root_elements = _ROOT_XPATH(self.schema_doc)
         if root_elements:
             return root_elements[0]
         return None
@@ -61,35 +71,40 @@ class XMLGenerator:
         """Generate a random string."""
         if length is None:
             length = self.DEFAULT_STRING_LENGTH
-        chars = string.ascii_letters + string.digits + ' '
-        return ''.join(random.choice(chars) for _ in range(length))
+        # Draw a few spare bytes, so rejected ones rarely need a second draw
+        raw = self._rng.getrandbits(8 * length + 64).to_bytes(length + 8, 'little')
+        chars = raw.translate(_STRING_TABLE, _STRING_REJECTED)
+        while len(chars) < length:
+            raw = self._rng.getrandbits(64).to_bytes(8, 'little')
+            chars += raw.translate(_STRING_TABLE, _STRING_REJECTED)
+        return chars[:length].decode('ascii')
     
     def _generate_integer(self) -> str:
         """Generate a random integer."""
-        return str(random.randint(-1000000, 1000000))
+        return str(self._rng.randint(-1000000, 1000000))
     
     def _generate_decimal(self) -> str:
         """Generate a random decimal number."""
-        return f"{random.uniform(-1000000, 1000000):.2f}"
+        return f"{self._rng.uniform(-1000000, 1000000):.2f}"
     
     def _generate_date(self) -> str:
         """Generate a random date."""
-        year = random.randint(1900, 2100)
-        month = random.randint(1, 12)
-        day = random.randint(1, 28)  # Simplified to avoid month/leap year complexity
+        year = self._rng.randint(1900, 2100)
+        month = self._rng.randint(1, 12)
+        day = self._rng.randint(1, 28)  # Simplified to avoid month/leap year complexity
         return f"{year:04d}-{month:02d}-{day:02d}"
     
     def _generate_datetime(self) -> str:
         """Generate a random datetime."""
         date = self._generate_date()
-        hour = random.randint(0, 23)
-        minute = random.randint(0, 59)
-        second = random.randint(0, 59)
+        hour = self._rng.randint(0, 23)
+        minute = self._rng.randint(0, 59)
+        second = self._rng.randint(0, 59)
         return f"{date}T{hour:02d}:{minute:02d}:{second:02d}Z"
     
     def _generate_boolean(self) -> str:
         """Generate a random boolean."""
-        return random.choice(['true', 'false'])
+        return self._rng.choice(['true', 'false'])
     
     def _generate_uri(self) -> str:
         """Generate a random URI."""
@@ -100,71 +115,79 @@ class XMLGenerator:
     def _generate_element_content(self, element: etree.Element, depth: int = 0) -> str:
         """Generate content for an element based on its type."""
         type_name = element.get('type', 'string')
-        base_type = type_name.split(':')[-1]
-        
-        generator = self.type_generators.get(base_type, self._generate_string)
+        generator = self._type_cache.get(type_name)
+        if generator is None:
+            base_type = type_name.rsplit(':', 1)[-1]
+            generator = self.type_generators.get(base_type, self._generate_string)
+            self._type_cache[type_name] = generator
         return generator()
     
-    def _create_element(self, element_def: etree.Element, parent: etree.Element,
-                       remaining_size: int, depth: int = 0) -> int:
-        """Create an element and its children, tracking size."""
-        if remaining_size <= 0 or depth > 100:  # Prevent infinite recursion
+    def _choose_children_count(self, remaining_size: int) -> int:
+        """Pick how many children a complex element gets, or none if the budget is too small."""
+        max_children = min(self.DEFAULT_MAX_CHILDREN, remaining_size // self.AVERAGE_ELEMENT_OVERHEAD)
+        if max_children < self.DEFAULT_MIN_CHILDREN:
             return 0
-        
-        # Create the element
-        name = element_def.get('name')
-        if ':' in name:
-            prefix, name = name.split(':')
-        element = etree.SubElement(parent, name)
+        return self._rng.randint(self.DEFAULT_MIN_CHILDREN, max_children)
+    
+    def _stream_elements(self, xf: etree.xmlfile, element_def: etree.Element,
+                         target_size: int) -> None:
+        """Write an element tree to the incremental writer depth-first."""
+        # Every generated element shares element_def, so resolve its name and type once
+        name = element_def.get('name').rsplit(':', 1)[-1]
+        if target_size <= 0:
+            return
         
         # Generate content or child elements
         if element_def.get('type'):
-            content = self._generate_element_content(element_def, depth)
-            element.text = content
-            size_used = len(content) + len(name) * 2 + 5  # Rough estimate of element size
-        else:
-            # Handle complex types
-            size_used = len(name) * 2 + 5
-            children_count = random.randint(
-                self.DEFAULT_MIN_CHILDREN,
-                min(self.DEFAULT_MAX_CHILDREN, remaining_size // self.AVERAGE_ELEMENT_OVERHEAD)
-            )
-            
-            for _ in range(children_count):
-                child_size = self._create_element(
-                    element_def,
-                    element,
-                    (remaining_size - size_used) // children_count,
-                    depth + 1
-                )
-                size_used += child_size
+            content = self._generate_element_content(element_def)
+            with xf.element(name):
+                xf.write(content)
+            return
         
-        return size_used
+        overhead = len(name) * 2 + 5  # Rough estimate of the tags' size
+        self._stream_complex_element(xf, name, overhead, target_size, 0)
     
-    def generate(self, target_size_bytes: int, output_path: str) -> None:
-        """Generate XML file of approximately target_size_bytes."""
-        # Create root element
-        root = etree.Element(self.root_element.get('name'), nsmap=self.nsmap)
-        doc = etree.ElementTree(root)
+    def _stream_complex_element(self, xf: etree.xmlfile, name: str, overhead: int,
+                                remaining_size: int, depth: int) -> None:
+        """Write a complex element and its children to the incremental writer."""
+        if remaining_size <= 0 or depth > 100:  # Prevent infinite recursion
+            return
+        
+        children_count = self._choose_children_count(remaining_size)
         
+        # Split the remaining budget evenly up front, handing the remainder to the first children
+        base, extra = divmod(remaining_size - overhead, max(children_count, 1))
+        with xf.element(name):
+            for i in range(children_count):
+                self._stream_complex_element(xf, name, overhead, base + (1 if i < extra else 0), depth + 1)
+    
+    def generate(self, target_size_bytes: int, output_path: str, validate: bool = False) -> None:
+        """Generate XML file of approximately target_size_bytes, optionally validating it."""
         # Calculate target number of elements
         target_elements = self._calculate_target_elements(target_size_bytes)
         
-        # Generate content
-        self._create_element(self.root_element, root, target_size_bytes)
+        # Stream elements straight to the file instead of building a tree in memory
+        with etree.xmlfile(output_path, encoding='UTF-8') as xf:
+            xf.write_declaration()
+            with xf.element(self.root_element.get('name'), nsmap=self.nsmap):
+                if self.root_element.get('type'):
+                    # A simple-typed root holds its content directly
+                    xf.write(self._generate_element_content(self.root_element))
+                else:
+                    self._stream_elements(xf, self.root_element, target_size_bytes)
         
-        # Write to file with pretty printing
-        doc.write(output_path, pretty_print=True, xml_declaration=True, encoding='UTF-8')
-        
-        # Verify size and schema validity
+        # Verify size
         actual_size = os.path.getsize(output_path)
         print(f"Generated XML file of size: {actual_size:,} bytes")
         
+        if not validate:
+            return
+        
+        # Validate against the schema while parsing, in a single pass over the file
         try:
-            doc = etree.parse(output_path)
-            self.schema.assertValid(doc)
+            etree.parse(output_path, etree.XMLParser(schema=self.schema))
             print("Generated XML is valid according to schema")
-        except etree.DocumentInvalid as e:
+        except etree.XMLSyntaxError as e:
             print(f"Warning: Generated XML is not valid: {e}")
         except Exception as e:
             print(f"Error validating generated XML: {e}")
@@ -175,12 +198,14 @@ def main():
     parser.add_argument('output', help='Path for output XML file')
     parser.add_argument('--size', type=int, default=1024,
                       help='Target size in bytes (default: 1KB)')
+    parser.add_argument('--validate', action='store_true',
+                      help='Validate the generated XML against the schema')
     
     args = parser.parse_args()
     
     try:
         generator = XMLGenerator(args.schema)
-        generator.generate(args.size, args.output)
+        generator.generate(args.size, args.output, args.validate)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,69 @@
+#!/usr/bin/env lua
+
+local validator = require("validator")
+
+-- Print usage information
+local function print_usage()
+    io.stderr:write("Usage: lua validate_driver.lua <config_path>\n")
+    io.stderr:write("  config_path: Path to the Lua configuration file\n")
+    io.stderr:write("  Reads one file path per line from stdin and writes one result line per file:\n")
+    io.stderr:write("  <cpu_seconds>\\t<ok|fail>\\t<message>\n")
+    os.exit(1)
+end
+
+-- Write one result line, keeping messages on a single line
+local function write_result(elapsed, is_valid, message)
+    message = tostring(message):gsub("[\r\n\t]", " ")
+    io.write(string.format("%.6f\t%s\t%s\n", elapsed, is_valid and "ok" or "fail", message))
+    io.flush()
+end
+
+-- Main execution
+local function main()
+    -- Check command line arguments
+    if #arg ~= 1 then
+        print_usage()
+    end
+    
+    local config_path = arg[1]
+    
+    -- Load and execute config file once for all files
+    local config_chunk, load_err = loadfile(config_path)
+    if not config_chunk then
+        io.stderr:write(string.format("Error: Cannot load config file '%s': %s\n", config_path, load_err))
+        os.exit(1)
+    end
+    
+    local success, config = pcall(config_chunk)
+    if not success then
+        io.stderr:write(string.format("Error: Cannot execute config file: %s\n", config))
+        os.exit(1)
+    end
+    
+    if type(config) ~= "table" then
+        io.stderr:write("Error: Config file must return a table\n")
+        os.exit(1)
+    end
+    
+    -- Validate each requested file, timing the read and the validation in CPU seconds
+    for file_path in io.lines() do
+        local start_time = os.clock()
+        local input_file = io.open(file_path, "r")
+        if not input_file then
+            write_result(0, false, string.format("Cannot open input file '%s'", file_path))
+        else
+            local content = input_file:read("*a")
+            input_file:close()
+            
+            -- Report validator errors as failed results so one bad file doesn't stop the driver
+            local ok, is_valid, message = pcall(validator.validate_file, content, config)
+            if not ok then
+                is_valid, message = false, string.format("Validator error: %s", is_valid)
+            end
+            write_result(os.clock() - start_time, is_valid, message)
+        end
+    end
+end
+
+-- Run the main function
+main()